@@ -1,15 +1,20 @@
 import os
+import re
+import asyncio
+import json
 import logging
-import threading
 import time
-import psycopg2
+import weakref
+from collections import deque
+import asyncpg
 from dotenv import load_dotenv
 from telegram import Update, ReplyKeyboardMarkup, KeyboardButton
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, MessageHandler,
-    filters, ContextTypes, ConversationHandler
+    AIORateLimiter, ApplicationBuilder, BaseUpdateProcessor, CommandHandler,
+    MessageHandler, filters, ContextTypes, ConversationHandler
 )
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from functools import lru_cache
 import calendar
 
 # Configuração de logs
@@ -31,18 +36,102 @@ MESES_PT = [
 ]
 MESES_MAP = {nome[0]: idx + 1 for idx, nome in enumerate(MESES_PT)}
 
+# Data atual em cache, recalculada apenas na virada do dia (meia-noite local)
+_HOJE = {"valor": None, "ate": 0.0}
+
+def hoje():
+    if time.time() >= _HOJE["ate"]:
+        valor = date.today()
+        _HOJE["valor"] = valor
+        _HOJE["ate"] = datetime.combine(valor + timedelta(days=1), datetime.min.time()).timestamp()
+    return _HOJE["valor"]
+
+@lru_cache(maxsize=64)
+def limites_mes(ano, mes):
+    """Primeiro e último dia do mês"""
+    return date(ano, mes, 1), date(ano, mes, calendar.monthrange(ano, mes)[1])
+
+# Consultas do bot. O asyncpg prepara cada texto SQL uma única vez por conexão
+# (PREPARE no servidor) e reaproveita o plano nas execuções seguintes, por isso
+# os textos ficam fixos aqui em vez de montados dentro dos handlers.
+# Retorna TRUE quando o usuário foi inserido, FALSE quando foi atualizado e
+# nenhuma linha quando os dados já estavam iguais
+SQL_USUARIO_UPSERT = """
+    INSERT INTO usuarios (id, first_name, username)
+    VALUES ($1, $2, $3)
+    ON CONFLICT (id) DO UPDATE
+    SET first_name = EXCLUDED.first_name, username = EXCLUDED.username
+    WHERE usuarios.first_name IS DISTINCT FROM EXCLUDED.first_name
+       OR usuarios.username IS DISTINCT FROM EXCLUDED.username
+    RETURNING (xmax = 0) AS inserido
+"""
+# Tamanho da coluna descricao (VARCHAR(255)): um texto maior derrubaria a gravação
+DESCRICAO_MAX = 255
+# Regex para aceitar apenas números positivos, com ou sem decimal
+VALOR_RE = re.compile(r'^\d+(\.\d{1,2})?$')
+
+# Resumo do mês em uma única ida ao banco: o PostgreSQL já devolve a
+# quantidade, o total, as maiores categorias e só as primeiras linhas de
+# detalhe (com a data formatada), em vez de todas as linhas do mês
+CONSULTA_MAX_REGISTROS = 50
+CONSULTA_TOP_CATEGORIAS = 5
+LIMITE_MENSAGEM = 4096
+
+SQL_RESUMO_MES = """
+    WITH m AS (
+        SELECT data, categoria, valor, descricao
+        FROM {tabela}
+        WHERE usuario_id = $1 AND data BETWEEN $2 AND $3
+    )
+    SELECT
+        (SELECT COUNT(*) FROM m) AS quantidade,
+        (SELECT COALESCE(SUM(valor), 0) FROM m) AS total,
+        (SELECT json_agg(json_build_array(categoria, total) ORDER BY total DESC)
+         FROM (SELECT categoria, SUM(valor) AS total FROM m
+               GROUP BY categoria ORDER BY total DESC LIMIT {top}) c) AS categorias,
+        (SELECT json_agg(json_build_array(to_char(data, 'DD/MM/YYYY'), categoria, valor, descricao)
+                         ORDER BY data)
+         FROM (SELECT * FROM m ORDER BY data LIMIT {limite}) r) AS registros
+"""
+
+SQL_CONSULTA = {
+    tipo: SQL_RESUMO_MES.format(
+        tabela=tabela, top=CONSULTA_TOP_CATEGORIAS, limite=CONSULTA_MAX_REGISTROS
+    )
+    for tipo, tabela in (("receita", "receitas"), ("despesa", "despesas"))
+}
+
+# Gravação em lote: salvar() apenas enfileira o registro e o gravador em segundo
+# plano persiste a fila a cada LOTE_MAX_REGISTROS ou LOTE_MAX_ESPERA segundos, o
+# que ocorrer primeiro. Lotes pequenos usam INSERT com várias linhas em blocos de
+# potências de dois (128, 64, ..., 1), reaproveitando poucos statements
+# preparados; a partir de LOTE_MIN_COPY registros compensa usar COPY
+LOTE_MAX_REGISTROS = 500
+LOTE_MAX_ESPERA = 0.2
+LOTE_MAX_INSERT = 128
+LOTE_MIN_COPY = 256
+# Se o banco ou a rede cair, o bloco é tentado de novo com espera exponencial
+# até GRAVACAO_ESPERA_MAX segundos entre tentativas: o usuário já recebeu a
+# confirmação, então o registro só é descartado quando o próprio dado é
+# inválido (ERROS_DADOS), e aí o chat é avisado
+GRAVACAO_ESPERA_MAX = 60
+ERROS_DADOS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+TABELAS_GRAVACAO = {
+    "receita": ("receitas", ("usuario_id", "descricao", "categoria", "fonte", "valor", "data")),
+    "despesa": ("despesas", ("usuario_id", "descricao", "categoria", "forma_pagamento", "valor", "data"))
+}
+
 # Conexão PostgreSQL
-def setup_database():
-    try:
-        conn = psycopg2.connect(
-            host=os.getenv("DB_HOST"),
-            database=os.getenv("DB_NAME"),
-            user=os.getenv("DB_USER"),
-            password=os.getenv("DB_PASS")
-        )
-        cursor = conn.cursor()
+async def configurar_conexao(con):
+    """Executado pelo pool para cada nova conexão"""
+    # O resumo do mês chega como json_agg: decodifica direto para listas
+    await con.set_type_codec(
+        "json", encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+    )
 
-        cursor.execute("""
+async def setup_database(pool):
+    async with pool.acquire() as con:
+        await con.execute("""
             CREATE TABLE IF NOT EXISTS usuarios (
                 id BIGINT PRIMARY KEY,
                 first_name VARCHAR(100),
@@ -51,7 +140,7 @@ def setup_database():
             )
         """)
 
-        cursor.execute("""
+        await con.execute("""
             CREATE TABLE IF NOT EXISTS receitas (
                 id SERIAL PRIMARY KEY,
                 usuario_id BIGINT REFERENCES usuarios(id) ON DELETE CASCADE,
@@ -64,7 +153,7 @@ def setup_database():
             )
         """)
 
-        cursor.execute("""
+        await con.execute("""
             CREATE TABLE IF NOT EXISTS despesas (
                 id SERIAL PRIMARY KEY,
                 usuario_id BIGINT REFERENCES usuarios(id) ON DELETE CASCADE,
@@ -77,14 +166,182 @@ def setup_database():
             )
         """)
 
-        conn.commit()
+        # Índices cobrindo as consultas por mês: index-only scan já ordenado por data
+        await con.execute("""
+            CREATE INDEX IF NOT EXISTS receitas_user_data_idx
+            ON receitas (usuario_id, data) INCLUDE (categoria, valor, descricao)
+        """)
+
+        await con.execute("""
+            CREATE INDEX IF NOT EXISTS despesas_user_data_idx
+            ON despesas (usuario_id, data) INCLUDE (categoria, valor, descricao)
+        """)
+
+        # Índices estreitos para as agregações do dashboard (todos os usuários,
+        # por mês e fonte/categoria): index-only scan sem ler a descrição
+        await con.execute("""
+            CREATE INDEX IF NOT EXISTS receitas_data_idx
+            ON receitas (data) INCLUDE (fonte, valor)
+        """)
+
+        await con.execute("""
+            CREATE INDEX IF NOT EXISTS despesas_data_idx
+            ON despesas (data) INCLUDE (categoria, valor)
+        """)
+
+@lru_cache(maxsize=None)
+def sql_insert_multiplo(tabela, colunas, linhas):
+    """INSERT com `linhas` tuplas em VALUES ($1, ..., $n), (...)"""
+    k = len(colunas)
+    valores = ", ".join(
+        "(" + ", ".join(f"${i * k + j + 1}" for j in range(k)) + ")"
+        for i in range(linhas)
+    )
+    return f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES {valores}"
+
+def blocos_potencia_de_dois(registros):
+    """Divide os registros em blocos de LOTE_MAX_INSERT, 64, 32, ..., 1"""
+    inicio = 0
+    tamanho = LOTE_MAX_INSERT
+    while inicio < len(registros):
+        while tamanho > len(registros) - inicio:
+            tamanho //= 2
+        yield registros[inicio:inicio + tamanho]
+        inicio += tamanho
+
+async def gravar_lote(app, lote):
+    """Persiste um lote de (tipo, registro, chat_id), uma transação por bloco"""
+    por_tipo = {}
+    for tipo, registro, chat_id in lote:
+        por_tipo.setdefault(tipo, []).append((registro, chat_id))
+    for tipo, itens in por_tipo.items():
+        tabela, colunas = TABELAS_GRAVACAO[tipo]
+        if len(itens) >= LOTE_MIN_COPY:
+            pendentes = deque([itens])
+        else:
+            pendentes = deque(blocos_potencia_de_dois(itens))
+        espera = 1
+        while pendentes:
+            bloco = pendentes[0]
+            try:
+                async with app.bot_data["pool"].acquire() as con:
+                    await gravar_bloco(con, tabela, colunas, [registro for registro, _ in bloco])
+            except ERROS_DADOS as e:
+                pendentes.popleft()
+                if len(bloco) > 1:
+                    # Um registro inválido não pode levar junto o bloco
+                    # inteiro (que mistura vários usuários): regrava um a um
+                    # e perde só os ruins
+                    logging.warning("Erro ao gravar %d registros em %s, regravando um a um: %s", len(bloco), tabela, e)
+                    pendentes.extendleft([item] for item in reversed(bloco))
+                else:
+                    await descartar_registro(app, tabela, *bloco[0], e)
+                continue
+            except Exception as e:
+                # Banco ou rede fora do ar (OSError, PostgresConnectionError,
+                # InterfaceError, timeout): espera e tenta o mesmo bloco de novo
+                logging.warning("⏳ Erro ao gravar em %s (%s), nova tentativa em %ss", tabela, e, espera)
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, GRAVACAO_ESPERA_MAX)
+                continue
+            pendentes.popleft()
+            espera = 1
+
+async def gravar_bloco(con, tabela, colunas, registros):
+    """Grava os registros numa única transação"""
+    async with con.transaction():
+        # O usuário já recebeu a confirmação ao enfileirar: não vale
+        # esperar o flush do WAL a cada lote
+        await con.execute("SET LOCAL synchronous_commit TO OFF")
+        if len(registros) >= LOTE_MIN_COPY:
+            await con.copy_records_to_table(tabela, records=registros, columns=colunas)
+        else:
+            sql = sql_insert_multiplo(tabela, colunas, len(registros))
+            await con.execute(sql, *(valor for registro in registros for valor in registro))
+
+async def descartar_registro(app, tabela, registro, chat_id, erro):
+    """Registra no log o registro inválido e avisa o chat que o enviou"""
+    logging.error("Registro descartado em %s: %r (%s)", tabela, registro, erro)
+    descricao, data = registro[1], registro[5]
+    try:
+        await app.bot.send_message(
+            chat_id,
+            f"❌ Erro ao salvar \"{descricao}\" de {data:%d/%m/%Y}! Tente novamente."
+        )
+    except Exception as e:
+        logging.error("Erro ao avisar o chat %s: %s", chat_id, e)
+
+async def gravador(app):
+    """Drena a fila de gravação em lotes enquanto o bot estiver rodando"""
+    fila = app.bot_data["fila_gravacao"]
+    loop = asyncio.get_running_loop()
+    while True:
+        lote = [await fila.get()]
+        prazo = loop.time() + LOTE_MAX_ESPERA
+        while len(lote) < LOTE_MAX_REGISTROS:
+            restante = prazo - loop.time()
+            if restante <= 0:
+                break
+            try:
+                lote.append(await asyncio.wait_for(fila.get(), restante))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await gravar_lote(app, lote)
+        finally:
+            for _ in lote:
+                fila.task_done()
+
+async def conectar_banco(tentativas=6):
+    """Cria o pool de conexões, tentando de novo com espera exponencial se o banco não responder"""
+    for tentativa in range(tentativas):
+        try:
+            return await asyncpg.create_pool(
+                host=os.getenv("DB_HOST"),
+                database=os.getenv("DB_NAME"),
+                user=os.getenv("DB_USER"),
+                password=os.getenv("DB_PASS"),
+                min_size=4,
+                max_size=20,
+                statement_cache_size=1024,
+                # As consultas por mês só mudam o intervalo de datas: o plano
+                # genérico evita replanejar a cada execução do statement
+                # preparado. Vai como parâmetro de conexão para sobreviver ao
+                # RESET ALL que o pool faz ao devolver cada conexão
+                server_settings={"plan_cache_mode": "force_generic_plan"},
+                init=configurar_conexao
+            )
+        except (OSError, asyncpg.CannotConnectNowError, asyncpg.TooManyConnectionsError) as e:
+            if tentativa == tentativas - 1:
+                raise
+            espera = 2 ** tentativa
+            logging.warning("⏳ Banco indisponível (%s), nova tentativa em %ss", e, espera)
+            await asyncio.sleep(espera)
+
+async def post_init(app):
+    """Cria o pool de conexões assíncrono e configura o banco"""
+    try:
+        pool = await conectar_banco()
+        await setup_database(pool)
+        app.bot_data["pool"] = pool
+        app.bot_data["fila_gravacao"] = asyncio.Queue()
+        # Usuários que já têm linha em usuarios nesta execução do bot
+        app.bot_data["usuarios_registrados"] = set()
+        app.bot_data["gravador"] = asyncio.create_task(gravador(app))
         logging.info("✅ Banco de dados configurado com sucesso")
-        return conn, cursor
     except Exception as e:
         logging.error("❌ Erro no banco de dados: %s", e)
-        exit(1)
-
-conn, cursor = setup_database()
+        raise
+
+async def post_shutdown(app):
+    """Grava o que ainda estiver na fila e fecha o pool de conexões"""
+    fila = app.bot_data.get("fila_gravacao")
+    if fila is not None:
+        await fila.join()
+        app.bot_data["gravador"].cancel()
+    pool = app.bot_data.get("pool")
+    if pool is not None:
+        await pool.close()
 
 # Categorias
 CATEGORIAS = {
@@ -112,33 +369,46 @@ FONTES_RECEITA = [
     ["Outras"]
 ]
 
+# Conjuntos para validar as escolhas e teclados montados uma única vez
+CATEGORIAS_SET = {tipo: frozenset(c for linha in linhas for c in linha) for tipo, linhas in CATEGORIAS.items()}
+FORMAS_PAGAMENTO_SET = frozenset(f for linha in FORMAS_PAGAMENTO for f in linha)
+FONTES_RECEITA_SET = frozenset(f for linha in FONTES_RECEITA for f in linha)
+
+TECLADO_CATEGORIAS = {
+    tipo: ReplyKeyboardMarkup(linhas + [[KeyboardButton("/cancelar")]], one_time_keyboard=True, resize_keyboard=True)
+    for tipo, linhas in CATEGORIAS.items()
+}
+TECLADO_FONTES = ReplyKeyboardMarkup(
+    FONTES_RECEITA + [[KeyboardButton("/cancelar")]], one_time_keyboard=True, resize_keyboard=True
+)
+TECLADO_FORMAS_PAGAMENTO = ReplyKeyboardMarkup(
+    FORMAS_PAGAMENTO + [[KeyboardButton("/cancelar")]], one_time_keyboard=True, resize_keyboard=True
+)
+TECLADO_INICIO = ReplyKeyboardMarkup(
+    [["/receita", "/despesa"], ["/consulta_receita", "/consulta_despesa"], ["/dashboard"]],
+    resize_keyboard=True
+)
+TECLADO_MESES = ReplyKeyboardMarkup(MESES_PT + [[KeyboardButton("/cancelar")]], resize_keyboard=True)
+TECLADO_CANCELAR = ReplyKeyboardMarkup([[KeyboardButton("/cancelar")]], resize_keyboard=True)
+TECLADO_DATA = ReplyKeyboardMarkup(
+    [["Hoje", "Outra data"], [KeyboardButton("/cancelar")]], one_time_keyboard=True, resize_keyboard=True
+)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
+    pool = context.bot_data["pool"]
     try:
-        cursor.execute("SELECT 1 FROM usuarios WHERE id = %s", (user.id,))
-        if cursor.fetchone() is None:
-            cursor.execute("""
-                INSERT INTO usuarios (id, first_name, username)
-                VALUES (%s, %s, %s)
-            """, (user.id, user.first_name, user.username))
+        inserido = await pool.fetchval(SQL_USUARIO_UPSERT, user.id, user.first_name, user.username)
+        if inserido:
             logging.info(f"🧑‍💻 Novo usuário registrado: {user.id}")
-        else:
-            cursor.execute("""
-                UPDATE usuarios
-                SET first_name = %s, username = %s
-                WHERE id = %s
-            """, (user.first_name, user.username, user.id))
+        elif inserido is not None:
             logging.info(f"♻️ Dados do usuário atualizados: {user.id}")
-        conn.commit()
+        context.bot_data["usuarios_registrados"].add(user.id)
     except Exception as e:
         logging.error(f"Erro ao registrar usuário: {e}")
-        conn.rollback()
     await update.message.reply_text(
         "👋 Olá! O que você deseja registrar?",
-        reply_markup=ReplyKeyboardMarkup(
-            [["/receita", "/despesa"], ["/consulta_receita", "/consulta_despesa"], ["/dashboard"]],
-            resize_keyboard=True
-        )
+        reply_markup=TECLADO_INICIO
     )
 
 async def receita(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -157,7 +427,7 @@ async def consulta_receita(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["consulta_tipo"] = "receita"
     await update.message.reply_text(
         "📅 Qual mês você quer consultar as receitas?",
-        reply_markup=ReplyKeyboardMarkup(MESES_PT + [[KeyboardButton("/cancelar")]], resize_keyboard=True)
+        reply_markup=TECLADO_MESES
     )
     return CONSULTA_MES
 
@@ -165,7 +435,7 @@ async def consulta_despesa(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["consulta_tipo"] = "despesa"
     await update.message.reply_text(
         "📅 Qual mês você quer consultar as despesas?",
-        reply_markup=ReplyKeyboardMarkup(MESES_PT + [[KeyboardButton("/cancelar")]], resize_keyboard=True)
+        reply_markup=TECLADO_MESES
     )
     return CONSULTA_MES
 
@@ -180,66 +450,70 @@ async def dashboard_link(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     return ConversationHandler.END
 
+def dividir_mensagem(linhas, limite=LIMITE_MENSAGEM):
+    """Agrupa as linhas em mensagens que respeitam o limite do Telegram"""
+    mensagens, atual, tamanho = [], [], 0
+    for linha in linhas:
+        linha = linha[:limite]
+        if atual and tamanho + len(linha) + 1 > limite:
+            mensagens.append("\n".join(atual))
+            atual, tamanho = [], 0
+        atual.append(linha)
+        tamanho += len(linha) + 1
+    if atual:
+        mensagens.append("\n".join(atual))
+    return mensagens
+
 async def mostrar_consulta(update: Update, context: ContextTypes.DEFAULT_TYPE):
     tipo = context.user_data.get("consulta_tipo")
     mes_nome = update.message.text.strip()
     user_id = update.effective_user.id
-    ano_atual = date.today().year
+    ano_atual = hoje().year
 
     mes_num = MESES_MAP.get(mes_nome)
     if not mes_num:
         await update.message.reply_text("⚠️ Mês inválido! Use os botões.")
         return DATA
 
-    primeiro_dia = date(ano_atual, mes_num, 1)
-    ultimo_dia = date(ano_atual, mes_num, calendar.monthrange(ano_atual, mes_num)[1])
+    primeiro_dia, ultimo_dia = limites_mes(ano_atual, mes_num)
 
-    if tipo == "receita":
-        cursor.execute("""
-            SELECT data, categoria, valor, descricao
-            FROM receitas
-            WHERE usuario_id = %s AND data BETWEEN %s AND %s
-            ORDER BY data
-        """, (user_id, primeiro_dia, ultimo_dia))
-    else:
-        cursor.execute("""
-            SELECT data, categoria, valor, descricao
-            FROM despesas
-            WHERE usuario_id = %s AND data BETWEEN %s AND %s
-            ORDER BY data
-        """, (user_id, primeiro_dia, ultimo_dia))
-
-    registros = cursor.fetchall()
-    if not registros:
+    pool = context.bot_data["pool"]
+    sql = SQL_CONSULTA["receita" if tipo == "receita" else "despesa"]
+    resumo = await pool.fetchrow(sql, user_id, primeiro_dia, ultimo_dia)
+
+    if not resumo["quantidade"]:
         await update.message.reply_text("📭 Nenhum registro encontrado para este mês.")
     else:
         linhas = [
-            f"📌 {d.strftime('%d/%m/%Y')} - {c} - R${v:.2f} ({desc})"
-            for d, c, v, desc in registros
+            f"📌 {d} - {c} - R${v:.2f} ({desc})"
+            for d, c, v, desc in resumo["registros"]
         ]
-        await update.message.reply_text("\n".join(linhas))
+        restantes = resumo["quantidade"] - len(linhas)
+        if restantes > 0:
+            linhas.append(f"… e mais {restantes} registros")
+        linhas.append("")
+        linhas.append(f"💰 Total: R${resumo['total']:.2f} em {resumo['quantidade']} registros")
+        linhas.append("🏷️ Principais categorias:")
+        linhas.extend(f"  • {c}: R${v:.2f}" for c, v in resumo["categorias"])
+        for mensagem in dividir_mensagem(linhas):
+            await update.message.reply_text(mensagem)
 
     context.user_data.clear()
     return ConversationHandler.END
 
 async def descricao(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    context.user_data["descricao"] = update.message.text
+    context.user_data["descricao"] = update.message.text[:DESCRICAO_MAX]
     tipo = context.user_data["tipo"]
     await update.message.reply_text(
         "🗂 Escolha a categoria:",
-        reply_markup=ReplyKeyboardMarkup(
-            CATEGORIAS[tipo] + [[KeyboardButton("/cancelar")]],
-            one_time_keyboard=True,
-            resize_keyboard=True
-        )
+        reply_markup=TECLADO_CATEGORIAS[tipo]
     )
     return CATEGORIA
 
 async def categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     entrada = update.message.text
     tipo = context.user_data["tipo"]
-    categorias_validas = sum(CATEGORIAS[tipo], [])
-    if entrada not in categorias_validas:
+    if entrada not in CATEGORIAS_SET[tipo]:
         await update.message.reply_text("⚠️ Categoria inválida! Use os botões.")
         return CATEGORIA
     context.user_data["categoria"] = entrada
@@ -247,55 +521,44 @@ async def categoria(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if tipo == "receita":
         await update.message.reply_text(
             "🏦 Qual a fonte desta receita?",
-            reply_markup=ReplyKeyboardMarkup(
-                FONTES_RECEITA + [[KeyboardButton("/cancelar")]],
-                one_time_keyboard=True,
-                resize_keyboard=True
-            )
+            reply_markup=TECLADO_FONTES
         )
         return FONTE
     else:
         await update.message.reply_text(
             "💳 Qual a forma de pagamento?",
-            reply_markup=ReplyKeyboardMarkup(
-                FORMAS_PAGAMENTO + [[KeyboardButton("/cancelar")]],
-                one_time_keyboard=True,
-                resize_keyboard=True
-            )
+            reply_markup=TECLADO_FORMAS_PAGAMENTO
         )
         return FORMA_PAGAMENTO
 
 async def fonte(update: Update, context: ContextTypes.DEFAULT_TYPE):
     entrada = update.message.text
-    fontes_validas = sum(FONTES_RECEITA, [])
-    if entrada not in fontes_validas:
+    if entrada not in FONTES_RECEITA_SET:
         await update.message.reply_text("⚠️ Fonte inválida! Use os botões.")
         return FONTE
     context.user_data["fonte"] = entrada
     await update.message.reply_text(
         "💰 Qual o valor? (Ex: 1500.50)",
-        reply_markup=ReplyKeyboardMarkup([[KeyboardButton("/cancelar")]], resize_keyboard=True)
+        reply_markup=TECLADO_CANCELAR
     )
     return VALOR
 
 async def forma_pagamento(update: Update, context: ContextTypes.DEFAULT_TYPE):
     entrada = update.message.text
-    formas_validas = sum(FORMAS_PAGAMENTO, [])
-    if entrada not in formas_validas:
+    if entrada not in FORMAS_PAGAMENTO_SET:
         await update.message.reply_text("⚠️ Forma de pagamento inválida! Use os botões.")
         return FORMA_PAGAMENTO
     context.user_data["forma_pagamento"] = entrada
     await update.message.reply_text(
         "💰 Qual o valor? (Ex: 150.75)",
-        reply_markup=ReplyKeyboardMarkup([[KeyboardButton("/cancelar")]], resize_keyboard=True)
+        reply_markup=TECLADO_CANCELAR
     )
     return VALOR
 
-import re
 async def valor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     texto = update.message.text.replace(",", ".").strip()
-    # Regex para aceitar apenas números positivos, com ou sem decimal
-    if not re.match(r'^\d+(\.\d{1,2})?$', texto):
+    # Valores inteiros dispensam o regex
+    if not (texto.isdecimal() or VALOR_RE.match(texto)):
         await update.message.reply_text("⚠️ Valor inválido! Digite um número positivo (ex: 1234.56 ou 1234,56).")
         return VALOR
     valor = float(texto)
@@ -305,78 +568,77 @@ async def valor(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data["valor"] = valor
     await update.message.reply_text(
         "📅 Data da transação:",
-        reply_markup=ReplyKeyboardMarkup(
-            [["Hoje", "Outra data"], [KeyboardButton("/cancelar")]],
-            one_time_keyboard=True,
-            resize_keyboard=True
-        )
+        reply_markup=TECLADO_DATA
     )
     return DATA
 
 async def data(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.text == "Hoje":
-        context.user_data["data"] = datetime.today().date()
+        context.user_data["data"] = hoje()
         return await salvar(update, context)
     else:
         await update.message.reply_text(
             "📅 Digite a data (DD/MM/AAAA):",
-            reply_markup=ReplyKeyboardMarkup([[KeyboardButton("/cancelar")]], resize_keyboard=True)
+            reply_markup=TECLADO_CANCELAR
         )
         return DATA
 
+def ler_data(texto):
+    """Converte DD/MM/AAAA em date sem passar pelo strptime"""
+    dia, mes, ano = texto.strip().split("/")
+    if not (len(ano) == 4 and dia.isdecimal() and mes.isdecimal() and ano.isdecimal()):
+        raise ValueError(texto)
+    return date(int(ano), int(mes), int(dia))
+
 async def data_manual(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        data = datetime.strptime(update.message.text, "%d/%m/%Y").date()
-        if data > datetime.today().date():
-            await update.message.reply_text("⚠️ Data futura! Use uma data válida.")
-            return DATA
-        context.user_data["data"] = data
-        return await salvar(update, context)
+        data = ler_data(update.message.text)
     except ValueError:
         await update.message.reply_text("⚠️ Formato inválido! Use DD/MM/AAAA")
         return DATA
+    if data > hoje():
+        await update.message.reply_text("⚠️ Data futura! Use uma data válida.")
+        return DATA
+    context.user_data["data"] = data
+    return await salvar(update, context)
 
 async def salvar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     dados = context.user_data
     user_id = update.effective_user.id
 
-    if dados["data"] > datetime.today().date():
+    if dados["data"] > hoje():
         await update.message.reply_text("⚠️ Data futura não permitida! Use uma data válida.")
         return ConversationHandler.END
 
-    try:
-        if dados["tipo"] == "receita":
-            cursor.execute("""
-                INSERT INTO receitas (usuario_id, descricao, categoria, fonte, valor, data)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                user_id,
-                dados["descricao"],
-                dados["categoria"],
-                dados["fonte"],
-                dados["valor"],
-                dados["data"]
-            ))
-        else:
-            cursor.execute("""
-                INSERT INTO despesas (usuario_id, descricao, categoria, forma_pagamento, valor, data)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                user_id,
-                dados["descricao"],
-                dados["categoria"],
-                dados["forma_pagamento"],
-                dados["valor"],
-                dados["data"]
-            ))
-        conn.commit()
-        await update.message.reply_text("✅ Registro salvo com sucesso!")
-    except Exception as e:
-        conn.rollback()
-        logging.error("Erro ao salvar: %s", str(e))
-        await update.message.reply_text("❌ Erro ao salvar! Tente novamente.")
-
-    context.user_data.clear()
+    # O registro referencia usuarios: quem nunca usou /start precisa da linha
+    # antes de o lote chegar ao banco, senão a chave estrangeira o derruba
+    registrados = context.bot_data["usuarios_registrados"]
+    if user_id not in registrados:
+        user = update.effective_user
+        try:
+            await context.bot_data["pool"].fetchval(SQL_USUARIO_UPSERT, user.id, user.first_name, user.username)
+        except Exception as e:
+            logging.error(f"Erro ao registrar usuário: {e}")
+            await update.message.reply_text("⚠️ Não foi possível salvar agora. Tente novamente.")
+            return ConversationHandler.END
+        registrados.add(user_id)
+
+    extra = dados["fonte"] if dados["tipo"] == "receita" else dados["forma_pagamento"]
+    await context.bot_data["fila_gravacao"].put((
+        dados["tipo"],
+        (
+            user_id,
+            dados["descricao"],
+            dados["categoria"],
+            extra,
+            dados["valor"],
+            dados["data"]
+        ),
+        update.effective_chat.id
+    ))
+    await update.message.reply_text("✅ Registro salvo com sucesso!")
+
+    dados.clear()
     return ConversationHandler.END
 
 async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -384,10 +646,57 @@ async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("❌ Operação cancelada.")
     return ConversationHandler.END
 
+class ProcessadorPorChat(BaseUpdateProcessor):
+    """Processa updates de chats diferentes em paralelo, mantendo a ordem dentro de cada chat"""
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        # Uma trava por chat, descartada automaticamente quando ninguém mais a usa
+        self._travas = weakref.WeakValueDictionary()
+
+    async def process_update(self, update, coroutine):
+        chat = getattr(update, "effective_chat", None)
+        if chat is None:
+            await super().process_update(update, coroutine)
+            return
+        trava = self._travas.get(chat.id)
+        if trava is None:
+            trava = self._travas[chat.id] = asyncio.Lock()
+        # A trava do chat vem antes da vaga global: updates na fila de um
+        # chat que dispara mensagens não ocupam as vagas dos outros chats
+        async with trava:
+            await super().process_update(update, coroutine)
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
 def run_bot():
     """Função para executar o bot Telegram"""
     logging.info("Iniciando o bot Telegram...")
-    app = ApplicationBuilder().token(TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        # Limita os envios aos limites do Telegram (30 msg/s no total, 20 msg/min
+        # por grupo) em vez de estourar 429 e depender de novas tentativas
+        .rate_limiter(AIORateLimiter(
+            overall_max_rate=30,
+            overall_time_period=1,
+            group_max_rate=20,
+            group_time_period=60,
+            max_retries=3
+        ))
+        # Um chat lento não segura os demais; a ordem da conversa de cada chat é preservada
+        .concurrent_updates(ProcessadorPorChat(256))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
 
     conv_handler = ConversationHandler(
         entry_points=[
@@ -420,35 +729,6 @@ def run_bot():
     
     app.run_polling()
 
-def run_dashboard():
-    """Função para executar o dashboard"""
-    logging.info("Iniciando o dashboard...")
-    # Importamos o dashboard aqui para evitar conflitos de importação
-    import subprocess
-    import sys
-    
-    # Obter a porta do arquivo .env ou usar 12000 como padrão
-    port = os.getenv("DASHBOARD_PORT", "12000")
-    logging.info(f"Dashboard será iniciado na porta {port}")
-    
-    # Executar o dashboard em um processo separado
-    dashboard_process = subprocess.Popen(
-        [sys.executable, "dashboard_dark.py"],
-        stdout=open("dashboard.log", "w"),
-        stderr=subprocess.STDOUT
-    )
-    
-    logging.info(f"Dashboard iniciado com PID {dashboard_process.pid}")
-    return dashboard_process
-
 if __name__ == "__main__":
-    # Iniciar o dashboard em uma thread separada
-    dashboard_thread = threading.Thread(target=run_dashboard)
-    dashboard_thread.daemon = True  # Isso garante que a thread será encerrada quando o programa principal terminar
-    dashboard_thread.start()
-    
-    # Aguardar um momento para o dashboard iniciar
-    time.sleep(2)
-    
-    # Iniciar o bot na thread principal
+    # O dashboard roda como processo próprio (ver Procfile)
     run_bot()
\ No newline at end of file
@@ -1,85 +1,192 @@
 import dash
-from dash import dcc, html, Input, Output, State, callback
+from dash import dcc, html, Input, Output, State, callback, no_update
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import plotly.express as px
+from flask_caching import Cache
+from waitress import serve
 import plotly.graph_objects as go
+import plotly.io as pio
 import pandas as pd
 import numpy as np
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import datetime, timedelta
 import calendar
+from contextlib import contextmanager
+from functools import lru_cache
+import io
 from dotenv import load_dotenv
 import os
-import warnings
-from sklearn.linear_model import LinearRegression
-
-# Suprimir avisos de depreciação do pandas
-warnings.filterwarnings('ignore', category=FutureWarning)
-pd.set_option('future.no_silent_downcasting', True)
+import threading
+import time
+import weakref
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# Dash serializa as figuras com o JSON do plotly: orjson é bem mais rápido
+# que o encoder padrão para os arrays dos gráficos
+pio.json.config.default_engine = 'orjson'
+
 # Configurações do banco de dados
 DB_HOST = os.getenv("DB_HOST")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
-# Função para conectar ao banco de dados
+# Cache compartilhado pelos callbacks. Dados e figuras ficam guardados por
+# impressão digital das tabelas: enquanto nada mudar no banco, cada
+# atualização só consulta a impressão digital (no máximo a cada
+# FINGERPRINT_TIMEOUT segundos) e reaproveita as figuras prontas.
+# Com REDIS_URL definido o cache fica no Redis e é compartilhado entre
+# processos; sem ele, fica na memória do processo
+FINGERPRINT_TIMEOUT = 5
+CACHE_TIMEOUT = 3600
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    cache = Cache(config={
+        'CACHE_TYPE': 'RedisCache',
+        'CACHE_REDIS_URL': REDIS_URL,
+        'CACHE_DEFAULT_TIMEOUT': CACHE_TIMEOUT
+    })
+else:
+    cache = Cache(config={
+        'CACHE_TYPE': 'SimpleCache',
+        'CACHE_DEFAULT_TIMEOUT': CACHE_TIMEOUT
+    })
+
+# Número de threads do servidor WSGI (callbacks atendidos em paralelo)
+DASHBOARD_THREADS = int(os.getenv("DASHBOARD_THREADS", 8))
+
+# Pool de conexões compartilhado pelos callbacks, criado na primeira
+# consulta para o dashboard subir mesmo com o banco fora do ar. O getconn
+# falha (PoolError) quando o pool esgota, então o máximo acompanha as
+# threads do servidor, mais uma para o aquecedor do cache
+DB_POOL_MIN = 2
+DB_POOL_MAX = DASHBOARD_THREADS + 1
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_db_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    host=DB_HOST,
+                    database=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASS
+                )
+    return _pool
+
+# Função para conectar ao banco de dados (devolver com release_db_connection)
 def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        database=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS
-    )
+    conn = get_db_pool().getconn()
+    # Só leituras: sem transação aberta entre uma consulta e outra
+    conn.autocommit = True
     return conn
 
-# Função para obter dados de receitas e despesas
-def get_financial_data():
+def release_db_connection(conn):
+    get_db_pool().putconn(conn)
+
+# Cursor de uma conexão do pool, devolvida ao pool ao sair do bloco
+@contextmanager
+def db_cursor():
     conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
-    
-    # Obter receitas
-    cursor.execute("""
-        SELECT id, usuario_id, descricao, categoria, fonte, valor, data, created_at
-        FROM receitas
-        ORDER BY data DESC
-    """)
-    receitas = cursor.fetchall()
-    
-    # Obter despesas
-    cursor.execute("""
-        SELECT id, usuario_id, descricao, categoria, forma_pagamento, valor, data, created_at
-        FROM despesas
-        ORDER BY data DESC
-    """)
-    despesas = cursor.fetchall()
-    
-    cursor.close()
-    conn.close()
+    try:
+        with conn.cursor() as cursor:
+            yield cursor
+    finally:
+        release_db_connection(conn)
+
+# Contagem e último created_at de cada tabela: muda a cada novo lançamento.
+# Vem como texto para poder ir direto para o dcc.Store do navegador
+SQL_FINGERPRINT = """
+    SELECT concat_ws('|',
+        (SELECT COUNT(*) FROM receitas), (SELECT MAX(created_at) FROM receitas),
+        (SELECT COUNT(*) FROM despesas), (SELECT MAX(created_at) FROM despesas)
+    )
+"""
+
+# Os gráficos só usam somas por mês e por categoria/fonte: o PostgreSQL já
+# devolve os valores agregados nessa granularidade, em vez de todas as linhas.
+# Receitas e despesas vêm numa única consulta, marcadas por 'tipo', e a
+# fonte/categoria na coluna 'chave'
+SQL_DADOS = """
+    SELECT 'R' AS tipo, date_trunc('month', data)::date AS data, fonte AS chave, SUM(valor)::float8 AS valor
+    FROM receitas
+    GROUP BY 2, 3
+    UNION ALL
+    SELECT 'D', date_trunc('month', data)::date, categoria, SUM(valor)::float8
+    FROM despesas
+    GROUP BY 2, 3
+    ORDER BY 2
+"""
+
+# Lê o resultado de uma consulta via COPY ... TO STDOUT em CSV direto para
+# o pandas, sem montar um dict Python por linha
+def read_sql_copy(cursor, sql):
+    buffer = io.StringIO()
+    cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH CSV HEADER", buffer)
+    buffer.seek(0)
+    # Tipo e categoria/fonte como Categorical: poucos valores distintos, agrupados
+    # pelos códigos inteiros. 'valor' continua float64: em float32 somas
+    # acima de ~R$ 160 mil já perdem os centavos
+    return pd.read_csv(
+        buffer,
+        parse_dates=['data'],
+        dtype={'valor': 'float64', 'tipo': 'category', 'chave': 'category'},
+        keep_default_na=False,
+        na_values=['']
+    )
+
+# Linhas de um tipo ('R' ou 'D'), com a coluna 'chave' renomeada para
+# fonte/categoria e só as categorias que aparecem nelas
+def separar_tipo(df, tipo, coluna):
+    parte = df.loc[df['tipo'] == tipo, ['data', 'chave', 'valor', 'mes']]
+    parte = parte.rename(columns={'chave': coluna}).reset_index(drop=True)
+    parte[coluna] = parte[coluna].cat.remove_unused_categories()
+    return parte
+
+# Conexões do pool em que a consulta da impressão digital já foi preparada
+# (PREPARE vale para a sessão inteira: analisada e planejada uma vez só)
+_fingerprint_preparado = weakref.WeakSet()
+
+# Impressão digital dos dados, usada como chave dos caches abaixo
+@cache.memoize(timeout=FINGERPRINT_TIMEOUT)
+def get_data_fingerprint():
+    with db_cursor() as cursor:
+        if cursor.connection not in _fingerprint_preparado:
+            cursor.execute(f"PREPARE fingerprint AS {SQL_FINGERPRINT}")
+            _fingerprint_preparado.add(cursor.connection)
+        cursor.execute("EXECUTE fingerprint")
+        return cursor.fetchone()[0]
+
+# Função para obter dados de receitas e despesas
+@cache.memoize(timeout=CACHE_TIMEOUT)
+def get_financial_data(fingerprint):
+    with db_cursor() as cursor:
+        # Obter receitas por mês e fonte e despesas por mês e categoria
+        df = read_sql_copy(cursor, SQL_DADOS)
     
-    # Converter para DataFrames
-    df_receitas = pd.DataFrame(receitas) if receitas else pd.DataFrame(columns=['id', 'usuario_id', 'descricao', 'categoria', 'fonte', 'valor', 'data', 'created_at'])
-    df_despesas = pd.DataFrame(despesas) if despesas else pd.DataFrame(columns=['id', 'usuario_id', 'descricao', 'categoria', 'forma_pagamento', 'valor', 'data', 'created_at'])
+    # Mês como inteiro de 32 bits (meses desde 1970-01); o rótulo 'AAAA-MM'
+    # só é gerado depois da agregação, sobre poucas linhas
+    df['mes'] = df['data'].to_numpy().astype('datetime64[M]').astype('int32')
     
-    # Adicionar tipo para facilitar a identificação
-    if not df_receitas.empty:
-        df_receitas['tipo'] = 'Receita'
-    if not df_despesas.empty:
-        df_despesas['tipo'] = 'Despesa'
+    df_receitas = separar_tipo(df, 'R', 'fonte')
+    df_despesas = separar_tipo(df, 'D', 'categoria')
     
     return df_receitas, df_despesas
 
 # Função para calcular resumo financeiro
 def get_financial_summary(df_receitas, df_despesas):
-    # Total de receitas
-    total_receitas = df_receitas['valor'].sum() if not df_receitas.empty else 0
+    # Total de receitas (soma direto no array float64, sem a redução do pandas)
+    total_receitas = df_receitas['valor'].to_numpy().sum() if not df_receitas.empty else 0
     
     # Total de despesas
-    total_despesas = df_despesas['valor'].sum() if not df_despesas.empty else 0
+    total_despesas = df_despesas['valor'].to_numpy().sum() if not df_despesas.empty else 0
     
     # Saldo
     saldo = total_receitas - total_despesas
@@ -94,119 +201,86 @@ def get_financial_summary(df_receitas, df_despesas):
         'percentual_gastos': percentual_gastos
     }
 
-# Função para agrupar despesas por categoria
-def group_expenses_by_category(df_despesas):
-    if df_despesas.empty:
-        return pd.DataFrame()
-    
-    # Agrupar por categoria
-    df_grouped = df_despesas.groupby('categoria').agg({'valor': 'sum'}).reset_index()
-    
-    return df_grouped
-
-# Função para agrupar receitas por fonte
-def group_income_by_source(df_receitas):
-    if df_receitas.empty:
-        return pd.DataFrame()
-    
-    # Agrupar por fonte
-    df_grouped = df_receitas.groupby('fonte').agg({'valor': 'sum'}).reset_index()
-    
-    return df_grouped
-
-# Função para agrupar despesas por mês
-def group_expenses_by_month(df_despesas):
-    if df_despesas.empty:
-        return pd.DataFrame()
-    
-    # Converter coluna de data para datetime
-    df_despesas['data'] = pd.to_datetime(df_despesas['data'])
-    
-    # Agrupar por mês
-    df_despesas['mes'] = df_despesas['data'].dt.strftime('%Y-%m')
-    df_grouped = df_despesas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-    
-    return df_grouped
-
-# Função para agrupar receitas por mês
-def group_income_by_month(df_receitas):
-    if df_receitas.empty:
-        return pd.DataFrame()
-    
-    # Converter coluna de data para datetime
-    df_receitas['data'] = pd.to_datetime(df_receitas['data'])
-    
-    # Agrupar por mês
-    df_receitas['mes'] = df_receitas['data'].dt.strftime('%Y-%m')
-    df_grouped = df_receitas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-    
-    return df_grouped
+# Converte códigos de mês (meses desde 1970-01) em rótulos 'AAAA-MM'
+def rotulos_mes(codigos):
+    return np.asarray(codigos, dtype='int64').astype('datetime64[M]').astype(str)
 
-# Função para agrupar por ano
-def group_by_year(df):
-    if df.empty:
-        return pd.DataFrame()
-    
-    # Converter coluna de data para datetime
-    df['data'] = pd.to_datetime(df['data'])
-    
-    # Agrupar por ano
-    df['ano'] = df['data'].dt.year
-    df_grouped = df.groupby('ano').agg({'valor': 'sum'}).reset_index()
-    
-    return df_grouped
+# Soma 'valor' por chave com factorize + bincount, sem montar um GroupBy
+def sum_by(df, key):
+    chaves = df[key] if isinstance(key, str) else key
+    codes, uniques = pd.factorize(chaves, sort=True)
+    validos = codes >= 0
+    totals = np.bincount(
+        codes[validos],
+        weights=df['valor'].to_numpy(dtype='float64')[validos],
+        minlength=len(uniques)
+    )
+    return pd.DataFrame({chaves.name: uniques, 'valor': totals})
 
-# Função para obter as categorias com maiores gastos
-def get_top_expense_categories(df_despesas, top_n=5):
-    if df_despesas.empty:
-        return pd.DataFrame()
-    
-    # Agrupar por categoria
-    df_grouped = df_despesas.groupby('categoria').agg({'valor': 'sum'}).reset_index()
-    
-    # Ordenar por valor e pegar os top_n
-    df_grouped = df_grouped.sort_values('valor', ascending=False).head(top_n)
-    
-    return df_grouped
+# Maiores top_n linhas por 'valor': argpartition separa os top_n em O(K) e
+# só eles são ordenados
+def top_by_value(df_grouped, top_n):
+    valores = df_grouped['valor'].to_numpy()
+    if valores.size > top_n:
+        indices = np.argpartition(-valores, top_n - 1)[:top_n]
+    else:
+        indices = np.arange(valores.size)
+    return df_grouped.iloc[indices[np.argsort(-valores[indices])]]
 
-# Função para obter as fontes com maiores receitas
-def get_top_income_sources(df_receitas, top_n=5):
-    if df_receitas.empty:
-        return pd.DataFrame()
-    
-    # Agrupar por fonte
-    df_grouped = df_receitas.groupby('fonte').agg({'valor': 'sum'}).reset_index()
-    
-    # Ordenar por valor e pegar os top_n
-    df_grouped = df_grouped.sort_values('valor', ascending=False).head(top_n)
+# Todas as agregações dos gráficos numa única passada por atualização: somas
+# por categoria/fonte e por mês, e daí os top 5, as somas anuais e o painel
+# mensal com receita, despesa, saldo, saldo acumulado e relação
+@cache.memoize(timeout=CACHE_TIMEOUT)
+def get_aggregates(fingerprint):
+    df_receitas, df_despesas = get_financial_data(fingerprint)
+    despesas_categoria = sum_by(df_despesas, 'categoria')
+    receitas_fonte = sum_by(df_receitas, 'fonte')
+    despesas_mes = sum_by(df_despesas, 'mes')
+    receitas_mes = sum_by(df_receitas, 'mes')
     
-    return df_grouped
+    return {
+        'despesas_categoria': despesas_categoria,
+        'receitas_fonte': receitas_fonte,
+        'top_despesas': top_by_value(despesas_categoria, 5),
+        'top_receitas': top_by_value(receitas_fonte, 5),
+        'despesas_mes': despesas_mes.assign(mes=rotulos_mes(despesas_mes['mes'])),
+        'receitas_mes': receitas_mes.assign(mes=rotulos_mes(receitas_mes['mes'])),
+        # Ano a partir do código do mês, somando os poucos totais mensais
+        'despesas_ano': sum_by(despesas_mes, (despesas_mes['mes'] // 12 + 1970).rename('ano')),
+        'receitas_ano': sum_by(receitas_mes, (receitas_mes['mes'] // 12 + 1970).rename('ano')),
+        'painel': monthly_panel(receitas_mes, despesas_mes)
+    }
 
-# Função para calcular a relação ganhos x despesas
-def calculate_income_expense_ratio(df_receitas, df_despesas):
-    if df_receitas.empty or df_despesas.empty:
-        return pd.DataFrame()
-    
-    # Converter coluna de data para datetime
-    df_receitas['data'] = pd.to_datetime(df_receitas['data'])
-    df_despesas['data'] = pd.to_datetime(df_despesas['data'])
-    
-    # Agrupar por mês
-    df_receitas['mes'] = df_receitas['data'].dt.strftime('%Y-%m')
-    df_despesas['mes'] = df_despesas['data'].dt.strftime('%Y-%m')
-    
-    df_receitas_mensal = df_receitas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-    df_despesas_mensal = df_despesas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-    
-    # Mesclar receitas e despesas
-    df_merged = pd.merge(df_receitas_mensal, df_despesas_mensal, on='mes', how='outer', suffixes=('_receita', '_despesa'))
-    df_merged = df_merged.fillna(0)
-    
-    # Calcular relação (receita / despesa)
-    df_merged['relacao'] = df_merged['valor_receita'] / df_merged['valor_despesa'].replace(0, np.nan)
-    df_merged['relacao'] = df_merged['relacao'].fillna(0)
+# Painel mensal a partir das somas por código de mês
+def monthly_panel(receitas, despesas):
+    # Todos os meses do primeiro ao último lançamento, inclusive os vazios
+    codigos = np.concatenate([receitas['mes'].to_numpy(), despesas['mes'].to_numpy()])
+    inicio = codigos.min() if codigos.size else 0
+    meses = np.arange(inicio, codigos.max() + 1 if codigos.size else 0)
+    
+    receita = np.zeros(meses.size)
+    despesa = np.zeros(meses.size)
+    receita[receitas['mes'].to_numpy() - inicio] = receitas['valor'].to_numpy()
+    despesa[despesas['mes'].to_numpy() - inicio] = despesas['valor'].to_numpy()
+    
+    # Relação (receita / despesa), zero nos meses sem despesa e vazia (NaN,
+    # uma falha na linha) nos meses sem nenhum lançamento
+    relacao = np.divide(receita, despesa, out=np.zeros(meses.size), where=despesa != 0)
+    tem_dados = np.zeros(meses.size, dtype=bool)
+    tem_dados[codigos - inicio] = True
+    relacao[~tem_dados] = np.nan
+    
+    # Saldo mensal e acumulado
+    saldo = receita - despesa
+    panel = pd.DataFrame({
+        'receita': receita,
+        'despesa': despesa,
+        'saldo': saldo,
+        'saldo_acumulado': np.cumsum(saldo),
+        'relacao': relacao
+    }, index=pd.Index(rotulos_mes(meses), name='mes'))
     
-    return df_merged
+    return panel
 
 # Cores para o tema escuro
 colors = {
@@ -223,6 +297,54 @@ colors = {
     'chart_colors': ['#4DA6FF', '#FF6B9D', '#00CC96', '#FFA15A', '#39C0C8', '#FF6B6B']
 }
 
+# Template padrão de todos os gráficos: plotly_dark com as cores do tema,
+# registrado uma única vez em vez de repetir fundo, fonte e grade em cada
+# figura
+pio.templates['financeiro'] = go.layout.Template(layout=dict(
+    paper_bgcolor=colors['card_background'],
+    plot_bgcolor=colors['card_background'],
+    font={'color': colors['text']},
+    xaxis=dict(showgrid=False, gridcolor=colors['grid']),
+    yaxis=dict(showgrid=True, gridcolor=colors['grid'])
+))
+pio.templates.default = 'plotly_dark+financeiro'
+
+# Legenda horizontal acima do gráfico, à direita
+LEGENDA_HORIZONTAL = dict(
+    orientation="h",
+    yanchor="bottom",
+    y=1.02,
+    xanchor="right",
+    x=1
+)
+
+# Segundo eixo Y, à direita, para a relação receita/despesa
+EIXO_RELACAO = dict(
+    title='Relação (Receita/Despesa)',
+    overlaying='y',
+    side='right',
+    showgrid=False,
+    zeroline=False
+)
+
+# Figuras exibidas quando não há dados, por título do gráfico, já como
+# dicionários prontos para envio
+EMPTY_FIGURES = {
+    titulo: go.Figure(layout={'title': f'{titulo} (Sem dados)'}).to_dict()
+    for titulo in (
+        'Despesas por Categoria',
+        'Receitas por Fonte',
+        'Receitas vs Despesas',
+        'Saldo Acumulado',
+        'Top 5 Categorias com Maiores Gastos',
+        'Top 5 Fontes com Maiores Receitas',
+        'Gastos por Mês',
+        'Receitas por Mês',
+        'Comparativo Anual',
+        'Relação entre Ganhos e Despesas'
+    )
+}
+
 # Inicializar o app Dash com tema escuro personalizado
 app = dash.Dash(
     __name__, 
@@ -233,6 +355,12 @@ app = dash.Dash(
     ]
 )
 server = app.server
+cache.init_app(server)
+
+# Rota de verificação de saúde para o supervisor do processo (systemd, Docker etc.)
+@server.route("/healthz")
+def healthz():
+    return "ok"
 
 # Estilo global
 app.index_string = '''
@@ -315,6 +443,9 @@ app.layout = dbc.Container([
                 interval=60*1000,  # atualizar a cada 1 minuto
                 n_intervals=0
             ),
+            # Impressão digital dos dados exibidos; as abas só recalculam
+            # quando ela muda
+            dcc.Store(id='financial-store', storage_type='memory'),
             
             dbc.Tabs([
                 # Aba de Visão Geral
@@ -464,7 +595,11 @@ app.layout = dbc.Container([
                                             ])
                                         ], width=4),
                                         dbc.Col([
-                                            html.Div(id="resultado-investimento", className="p-3")
+                                            html.Div(
+                                                html.Div("Preencha os campos e clique em Calcular para ver o resultado."),
+                                                id="resultado-investimento",
+                                                className="p-3"
+                                            )
                                         ], width=8)
                                     ])
                                 ])
@@ -501,7 +636,11 @@ app.layout = dbc.Container([
                                             ])
                                         ], width=4),
                                         dbc.Col([
-                                            html.Div(id="resultado-meta", className="p-3")
+                                            html.Div(
+                                                html.Div("Preencha os campos e clique em Calcular para ver o resultado."),
+                                                id="resultado-meta",
+                                                className="p-3"
+                                            )
                                         ], width=8)
                                     ])
                                 ])
@@ -526,15 +665,8 @@ app.layout = dbc.Container([
     ])
 ], fluid=True)
 
-# Callbacks para os cards de resumo
-@callback(
-    Output('summary-cards', 'children'),
-    [Input('interval-component', 'n_intervals')]
-)
-def update_summary_cards(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
-    
+# Cards de resumo
+def build_summary_cards(df_receitas, df_despesas, agregados):
     # Calcular resumo
     summary = get_financial_summary(df_receitas, df_despesas)
     
@@ -572,437 +704,217 @@ def update_summary_cards(n_intervals):
     
     return cards
 
-# Callback para o gráfico de despesas por categoria
-@callback(
-    [Output('despesas-categoria-graph', 'figure'),
-     Output('receitas-fonte-graph', 'figure')],
-    [Input('interval-component', 'n_intervals')]
-)
-def update_categoria_graphs(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
-    
-    # Gráfico de pizza para despesas por categoria
-    df_despesas_categoria = group_expenses_by_category(df_despesas)
-    if not df_despesas_categoria.empty:
-        fig_despesas = px.pie(
-            df_despesas_categoria, 
-            values='valor', 
-            names='categoria',
-            title='Despesas por Categoria',
-            hole=0.4,
-            color_discrete_sequence=colors['chart_colors'],
-            template='plotly_dark'
-        )
-        fig_despesas.update_layout(
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    else:
-        fig_despesas = go.Figure()
-        fig_despesas.update_layout(
-            title='Despesas por Categoria (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    
-    # Gráfico de pizza para receitas por fonte
-    df_receitas_fonte = group_income_by_source(df_receitas)
-    if not df_receitas_fonte.empty:
-        fig_receitas = px.pie(
-            df_receitas_fonte, 
-            values='valor', 
-            names='fonte',
-            title='Receitas por Fonte',
+# Figuras compartilhadas pelos pares despesas/receitas; com o DataFrame vazio
+# devolvem a figura "Sem dados" do título
+
+# Pizza de valores por categoria/fonte
+def figura_pizza(df, coluna, titulo):
+    if df.empty:
+        return EMPTY_FIGURES[titulo]
+    return go.Figure(
+        go.Pie(
+            labels=df[coluna].to_numpy(),
+            values=df['valor'].to_numpy(),
             hole=0.4,
-            color_discrete_sequence=colors['chart_colors'],
-            template='plotly_dark'
-        )
-        fig_receitas.update_layout(
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    else:
-        fig_receitas = go.Figure()
-        fig_receitas.update_layout(
-            title='Receitas por Fonte (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    
-    return fig_despesas, fig_receitas
+            marker_colors=colors['chart_colors']
+        ),
+        layout=dict(title=titulo)
+    )
 
-# Callback para o gráfico de receitas vs despesas
-@callback(
-    Output('receitas-despesas-graph', 'figure'),
-    [Input('interval-component', 'n_intervals')]
-)
-def update_receitas_despesas_graph(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
-    
-    # Converter coluna de data para datetime
+# Barras horizontais dos maiores valores por categoria/fonte. O top já vem
+# ordenado do maior para o menor: a ordem do eixo vai fixa (invertida, para
+# o maior ficar no topo) em vez de o navegador reordenar a cada atualização
+def figura_top(df, coluna, titulo, cor, rotulo):
+    if df.empty:
+        return EMPTY_FIGURES[titulo]
+    rotulos = df[coluna].to_numpy()
+    fig = go.Figure(
+        go.Bar(
+            y=rotulos,
+            x=df['valor'].to_numpy(),
+            orientation='h',
+            marker_color=cor
+        ),
+        layout=dict(title=titulo)
+    )
+    fig.update_layout(
+        xaxis_title='Valor (R$)',
+        yaxis_title=rotulo,
+        xaxis_showgrid=True,
+        yaxis_showgrid=False,
+        yaxis_categoryorder='array',
+        yaxis_categoryarray=rotulos[::-1]
+    )
+    return fig
+
+# Linha de valores por mês
+def figura_mensal(df, titulo, cor):
+    if df.empty:
+        return EMPTY_FIGURES[titulo]
+    fig = go.Figure(
+        go.Scatter(
+            x=df['mes'].to_numpy(),
+            y=df['valor'].to_numpy(),
+            mode='lines+markers',
+            line_color=cor
+        ),
+        layout=dict(title=titulo)
+    )
+    fig.update_layout(
+        xaxis_title='Mês',
+        yaxis_title='Valor (R$)'
+    )
+    return fig
+
+# Gráficos de despesas por categoria e receitas por fonte
+def build_categoria_graphs(df_receitas, df_despesas, agregados):
+    return (
+        figura_pizza(agregados['despesas_categoria'], 'categoria', 'Despesas por Categoria'),
+        figura_pizza(agregados['receitas_fonte'], 'fonte', 'Receitas por Fonte')
+    )
+
+# Gráfico de receitas vs despesas
+def build_receitas_despesas_graph(df_receitas, df_despesas, agregados):
+    # Colunas do painel mensal que têm dados: (nome, cor) de cada barra
+    tipos = {}
     if not df_receitas.empty:
-        df_receitas['data'] = pd.to_datetime(df_receitas['data'])
-        df_receitas['mes'] = df_receitas['data'].dt.strftime('%Y-%m')
-        df_receitas_mensal = df_receitas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-        df_receitas_mensal['tipo'] = 'Receita'
-    else:
-        df_receitas_mensal = pd.DataFrame(columns=['mes', 'valor', 'tipo'])
-    
+        tipos['receita'] = ('Receita', colors['success'])
     if not df_despesas.empty:
-        df_despesas['data'] = pd.to_datetime(df_despesas['data'])
-        df_despesas['mes'] = df_despesas['data'].dt.strftime('%Y-%m')
-        df_despesas_mensal = df_despesas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-        df_despesas_mensal['tipo'] = 'Despesa'
-    else:
-        df_despesas_mensal = pd.DataFrame(columns=['mes', 'valor', 'tipo'])
-    
-    # Combinar receitas e despesas
-    df_combined = pd.concat([df_receitas_mensal, df_despesas_mensal])
+        tipos['despesa'] = ('Despesa', colors['danger'])
     
     # Gráfico de barras para receitas e despesas
-    if not df_combined.empty:
-        fig = px.bar(
-            df_combined, 
-            x='mes', 
-            y='valor', 
-            color='tipo',
-            barmode='group',
-            title='Receitas vs Despesas',
-            color_discrete_map={'Receita': colors['success'], 'Despesa': colors['danger']},
-            template='plotly_dark'
+    if tipos:
+        panel = agregados['painel']
+        meses = panel.index.to_numpy()
+        fig = go.Figure(
+            [
+                go.Bar(x=meses, y=panel[coluna].to_numpy(), name=nome, marker_color=cor)
+                for coluna, (nome, cor) in tipos.items()
+            ],
+            layout=dict(title='Receitas vs Despesas', barmode='group')
         )
         fig.update_layout(
             xaxis_title='Mês',
             yaxis_title='Valor (R$)',
-            legend_title='Tipo',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=False, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=True, gridcolor=colors['grid'])
+            legend_title='Tipo'
         )
     else:
-        fig = go.Figure()
-        fig.update_layout(
-            title='Receitas vs Despesas (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
+        fig = EMPTY_FIGURES['Receitas vs Despesas']
     
     return fig
 
-# Callback para o gráfico de saldo acumulado
-@callback(
-    Output('saldo-acumulado-graph', 'figure'),
-    [Input('interval-component', 'n_intervals')]
-)
-def update_saldo_acumulado_graph(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
-    
-    # Converter coluna de data para datetime
-    if not df_receitas.empty:
-        df_receitas['data'] = pd.to_datetime(df_receitas['data'])
-        df_receitas['mes'] = df_receitas['data'].dt.strftime('%Y-%m')
-        df_receitas_mensal = df_receitas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-    else:
-        df_receitas_mensal = pd.DataFrame(columns=['mes', 'valor'])
-    
-    if not df_despesas.empty:
-        df_despesas['data'] = pd.to_datetime(df_despesas['data'])
-        df_despesas['mes'] = df_despesas['data'].dt.strftime('%Y-%m')
-        df_despesas_mensal = df_despesas.groupby('mes').agg({'valor': 'sum'}).reset_index()
-    else:
-        df_despesas_mensal = pd.DataFrame(columns=['mes', 'valor'])
-    
-    # Mesclar receitas e despesas
-    if not df_receitas_mensal.empty and not df_despesas_mensal.empty:
-        df_merged = pd.merge(df_receitas_mensal, df_despesas_mensal, on='mes', how='outer', suffixes=('_receita', '_despesa'))
-        df_merged = df_merged.fillna(0)
-        
-        # Calcular saldo mensal
-        df_merged['saldo'] = df_merged['valor_receita'] - df_merged['valor_despesa']
-        
-        # Calcular saldo acumulado
-        df_merged['saldo_acumulado'] = df_merged['saldo'].cumsum()
+# Gráfico de saldo acumulado
+def build_saldo_acumulado_graph(df_receitas, df_despesas, agregados):
+    if not df_receitas.empty and not df_despesas.empty:
+        # Saldo acumulado já vem do painel mensal
+        panel = agregados['painel']
+        meses = panel.index.to_numpy()
+        saldo_acumulado = panel['saldo_acumulado'].to_numpy()
         
-        # Gráfico de linha para saldo acumulado
-        fig = px.line(
-            df_merged, 
-            x='mes', 
-            y='saldo_acumulado',
-            markers=True,
-            title='Saldo Acumulado',
-            template='plotly_dark'
+        # Gráfico de linha para saldo acumulado, com a área acima/abaixo de
+        # zero colorida na própria linha
+        fig = go.Figure(
+            go.Scatter(
+                x=meses,
+                y=saldo_acumulado,
+                mode='lines+markers',
+                fill='tozeroy',
+                fillcolor='rgba(0, 204, 150, 0.2)' if saldo_acumulado[-1] >= 0 else 'rgba(255, 107, 107, 0.2)'
+            ),
+            layout=dict(title='Saldo Acumulado')
         )
         
         # Adicionar linha de referência em zero
         fig.add_shape(
             type="line",
-            x0=df_merged['mes'].min(),
+            x0=meses[0],
             y0=0,
-            x1=df_merged['mes'].max(),
+            x1=meses[-1],
             y1=0,
             line=dict(color="white", width=1, dash="dash"),
         )
         
-        # Colorir área acima/abaixo de zero
-        fig.add_traces(
-            px.area(
-                df_merged, 
-                x='mes', 
-                y='saldo_acumulado',
-                color_discrete_sequence=['rgba(0, 204, 150, 0.2)' if df_merged['saldo_acumulado'].iloc[-1] >= 0 else 'rgba(255, 107, 107, 0.2)']
-            ).data
-        )
-        
         fig.update_layout(
             xaxis_title='Mês',
-            yaxis_title='Valor (R$)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=False, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=True, gridcolor=colors['grid'])
+            yaxis_title='Valor (R$)'
         )
     else:
-        fig = go.Figure()
-        fig.update_layout(
-            title='Saldo Acumulado (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
+        fig = EMPTY_FIGURES['Saldo Acumulado']
     
     return fig
 
-# Callbacks para os gráficos da aba Análise Detalhada
-@callback(
-    [Output('maiores-gastos-graph', 'figure'),
-     Output('maiores-receitas-graph', 'figure')],
-    [Input('interval-component', 'n_intervals')]
-)
-def update_maiores_valores_graphs(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
-    
-    # Gráfico de barras horizontais para maiores gastos
-    df_top_despesas = get_top_expense_categories(df_despesas)
-    if not df_top_despesas.empty:
-        fig_despesas = px.bar(
-            df_top_despesas, 
-            y='categoria', 
-            x='valor',
-            orientation='h',
-            title='Top 5 Categorias com Maiores Gastos',
-            color_discrete_sequence=[colors['danger']],
-            template='plotly_dark'
-        )
-        fig_despesas.update_layout(
-            xaxis_title='Valor (R$)',
-            yaxis_title='Categoria',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=True, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=False)
-        )
-    else:
-        fig_despesas = go.Figure()
-        fig_despesas.update_layout(
-            title='Top 5 Categorias com Maiores Gastos (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    
-    # Gráfico de barras horizontais para maiores receitas
-    df_top_receitas = get_top_income_sources(df_receitas)
-    if not df_top_receitas.empty:
-        fig_receitas = px.bar(
-            df_top_receitas, 
-            y='fonte', 
-            x='valor',
-            orientation='h',
-            title='Top 5 Fontes com Maiores Receitas',
-            color_discrete_sequence=[colors['success']],
-            template='plotly_dark'
-        )
-        fig_receitas.update_layout(
-            xaxis_title='Valor (R$)',
-            yaxis_title='Fonte',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=True, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=False)
-        )
-    else:
-        fig_receitas = go.Figure()
-        fig_receitas.update_layout(
-            title='Top 5 Fontes com Maiores Receitas (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    
-    return fig_despesas, fig_receitas
+# Gráficos de maiores gastos e receitas
+def build_maiores_valores_graphs(df_receitas, df_despesas, agregados):
+    return (
+        figura_top(agregados['top_despesas'], 'categoria', 'Top 5 Categorias com Maiores Gastos', colors['danger'], 'Categoria'),
+        figura_top(agregados['top_receitas'], 'fonte', 'Top 5 Fontes com Maiores Receitas', colors['success'], 'Fonte')
+    )
 
-@callback(
-    [Output('gastos-mes-graph', 'figure'),
-     Output('receitas-mes-graph', 'figure')],
-    [Input('interval-component', 'n_intervals')]
-)
-def update_valores_mes_graphs(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
-    
-    # Gráfico de linha para gastos por mês
-    df_despesas_mes = group_expenses_by_month(df_despesas)
-    if not df_despesas_mes.empty:
-        fig_despesas = px.line(
-            df_despesas_mes, 
-            x='mes', 
-            y='valor',
-            markers=True,
-            title='Gastos por Mês',
-            color_discrete_sequence=[colors['danger']],
-            template='plotly_dark'
-        )
-        fig_despesas.update_layout(
-            xaxis_title='Mês',
-            yaxis_title='Valor (R$)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=False, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=True, gridcolor=colors['grid'])
-        )
-    else:
-        fig_despesas = go.Figure()
-        fig_despesas.update_layout(
-            title='Gastos por Mês (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    
-    # Gráfico de linha para receitas por mês
-    df_receitas_mes = group_income_by_month(df_receitas)
-    if not df_receitas_mes.empty:
-        fig_receitas = px.line(
-            df_receitas_mes, 
-            x='mes', 
-            y='valor',
-            markers=True,
-            title='Receitas por Mês',
-            color_discrete_sequence=[colors['success']],
-            template='plotly_dark'
-        )
-        fig_receitas.update_layout(
-            xaxis_title='Mês',
-            yaxis_title='Valor (R$)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=False, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=True, gridcolor=colors['grid'])
-        )
-    else:
-        fig_receitas = go.Figure()
-        fig_receitas.update_layout(
-            title='Receitas por Mês (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
-    
-    return fig_despesas, fig_receitas
+# Gráficos de valores por mês
+def build_valores_mes_graphs(df_receitas, df_despesas, agregados):
+    return (
+        figura_mensal(agregados['despesas_mes'], 'Gastos por Mês', colors['danger']),
+        figura_mensal(agregados['receitas_mes'], 'Receitas por Mês', colors['success'])
+    )
 
-@callback(
-    Output('comparativo-anual-graph', 'figure'),
-    [Input('interval-component', 'n_intervals')]
-)
-def update_comparativo_anual_graph(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
+# Gráfico comparativo anual
+def build_comparativo_anual_graph(df_receitas, df_despesas, agregados):
+    # Somas por ano
+    df_receitas_anual = agregados['receitas_ano']
+    df_despesas_anual = agregados['despesas_ano']
     
-    # Agrupar por ano
-    df_receitas_anual = group_by_year(df_receitas)
-    df_despesas_anual = group_by_year(df_despesas)
-    
-    # Preparar dados para o gráfico
+    # Uma barra por tipo, agrupadas por ano
     if not df_receitas_anual.empty and not df_despesas_anual.empty:
-        df_receitas_anual['tipo'] = 'Receita'
-        df_despesas_anual['tipo'] = 'Despesa'
-        
-        df_combined = pd.concat([df_receitas_anual, df_despesas_anual])
-        
-        fig = px.bar(
-            df_combined, 
-            x='ano', 
-            y='valor',
-            color='tipo',
-            barmode='group',
-            title='Comparativo Anual: Receitas vs Despesas',
-            color_discrete_map={'Receita': colors['success'], 'Despesa': colors['danger']},
-            template='plotly_dark'
+        fig = go.Figure(
+            [
+                go.Bar(
+                    x=df_receitas_anual['ano'].to_numpy(),
+                    y=df_receitas_anual['valor'].to_numpy(),
+                    name='Receita',
+                    marker_color=colors['success']
+                ),
+                go.Bar(
+                    x=df_despesas_anual['ano'].to_numpy(),
+                    y=df_despesas_anual['valor'].to_numpy(),
+                    name='Despesa',
+                    marker_color=colors['danger']
+                )
+            ],
+            layout=dict(title='Comparativo Anual: Receitas vs Despesas', barmode='group')
         )
         fig.update_layout(
             xaxis_title='Ano',
             yaxis_title='Valor (R$)',
-            legend_title='Tipo',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=False, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=True, gridcolor=colors['grid'])
+            legend_title='Tipo'
         )
     else:
-        fig = go.Figure()
-        fig.update_layout(
-            title='Comparativo Anual (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
+        fig = EMPTY_FIGURES['Comparativo Anual']
     
     return fig
 
-@callback(
-    Output('relacao-ganhos-despesas-graph', 'figure'),
-    [Input('interval-component', 'n_intervals')]
-)
-def update_relacao_ganhos_despesas_graph(n_intervals):
-    # Obter dados
-    df_receitas, df_despesas = get_financial_data()
-    
-    # Calcular relação ganhos x despesas
-    df_relacao = calculate_income_expense_ratio(df_receitas, df_despesas)
-    
-    if not df_relacao.empty:
+# Gráfico de relação entre ganhos e despesas
+def build_relacao_ganhos_despesas_graph(df_receitas, df_despesas, agregados):
+    if not df_receitas.empty and not df_despesas.empty:
+        # Relação ganhos x despesas do painel mensal, passada ao Plotly como
+        # arrays numpy (codificados em bloco, sem iterar elemento a elemento)
+        panel = agregados['painel']
+        meses = panel.index.to_numpy()
+        
         # Criar figura com dois eixos Y
         fig = go.Figure()
         
         # Adicionar barras para receitas e despesas
         fig.add_trace(go.Bar(
-            x=df_relacao['mes'],
-            y=df_relacao['valor_receita'],
+            x=meses,
+            y=panel['receita'].to_numpy(),
             name='Receitas',
             marker_color=colors['success'],
             opacity=0.7
         ))
         
         fig.add_trace(go.Bar(
-            x=df_relacao['mes'],
-            y=df_relacao['valor_despesa'],
+            x=meses,
+            y=panel['despesa'].to_numpy(),
             name='Despesas',
             marker_color=colors['danger'],
             opacity=0.7
@@ -1010,8 +922,8 @@ def update_relacao_ganhos_despesas_graph(n_intervals):
         
         # Adicionar linha para a relação
         fig.add_trace(go.Scatter(
-            x=df_relacao['mes'],
-            y=df_relacao['relacao'],
+            x=meses,
+            y=panel['relacao'].to_numpy(),
             name='Relação (Receita/Despesa)',
             mode='lines+markers',
             line=dict(color=colors['info'], width=3),
@@ -1021,9 +933,9 @@ def update_relacao_ganhos_despesas_graph(n_intervals):
         # Adicionar linha de referência em 1 (equilíbrio)
         fig.add_shape(
             type="line",
-            x0=df_relacao['mes'].iloc[0],
+            x0=meses[0],
             y0=1,
-            x1=df_relacao['mes'].iloc[-1],
+            x1=meses[-1],
             y1=1,
             line=dict(color="white", width=1, dash="dash"),
             yref='y2'
@@ -1032,35 +944,11 @@ def update_relacao_ganhos_despesas_graph(n_intervals):
         # Configurar layout com dois eixos Y
         fig.update_layout(
             title='Relação entre Ganhos e Despesas',
-            xaxis=dict(
-                title='Mês',
-                showgrid=False,
-                gridcolor=colors['grid']
-            ),
-            yaxis=dict(
-                title='Valor (R$)',
-                showgrid=True,
-                gridcolor=colors['grid']
-            ),
-            yaxis2=dict(
-                title='Relação (Receita/Despesa)',
-                overlaying='y',
-                side='right',
-                showgrid=False,
-                zeroline=False
-            ),
+            xaxis_title='Mês',
+            yaxis_title='Valor (R$)',
+            yaxis2=EIXO_RELACAO,
             barmode='group',
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ),
-            template='plotly_dark',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
+            legend=LEGENDA_HORIZONTAL
         )
         
         # Adicionar anotação para explicar a relação
@@ -1077,16 +965,190 @@ def update_relacao_ganhos_despesas_graph(n_intervals):
             opacity=0.8
         )
     else:
-        fig = go.Figure()
-        fig.update_layout(
-            title='Relação entre Ganhos e Despesas (Sem dados)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']}
-        )
+        fig = EMPTY_FIGURES['Relação entre Ganhos e Despesas']
     
     return fig
 
+# A cada intervalo só a impressão digital é consultada; se os dados não
+# mudaram o Store não é atualizado e os callbacks das abas nem rodam
+@callback(
+    Output('financial-store', 'data'),
+    [Input('interval-component', 'n_intervals')],
+    [State('financial-store', 'data')]
+)
+def update_financial_store(n_intervals, fingerprint_atual):
+    fingerprint = get_data_fingerprint()
+    if fingerprint == fingerprint_atual:
+        return no_update
+    return fingerprint
+
+# Um callback por aba: os dados, o painel mensal e todas as figuras da aba
+# saem de uma única leitura do cache por atualização. Só a aba visível é
+# atualizada; ao trocar de aba o callback dela roda com os dados atuais.
+# As figuras ficam no cache como dicionários, que são desserializados e
+# enviados sem reconstruir objetos go.Figure (com validação de cada
+# propriedade) a cada leitura; as figuras vazias (EMPTY_FIGURES) já são
+# dicionários
+def figura_dict(fig):
+    return fig if isinstance(fig, dict) else fig.to_dict()
+
+@callback(
+    [Output('summary-cards', 'children'),
+     Output('despesas-categoria-graph', 'figure'),
+     Output('receitas-fonte-graph', 'figure'),
+     Output('receitas-despesas-graph', 'figure'),
+     Output('saldo-acumulado-graph', 'figure')],
+    [Input('financial-store', 'data'),
+     Input('tabs', 'active_tab')]
+)
+def update_overview_tab(fingerprint, active_tab):
+    if fingerprint is None or active_tab != 'tab-overview':
+        raise PreventUpdate
+    return build_overview_tab(fingerprint)
+
+@cache.memoize(timeout=CACHE_TIMEOUT)
+def build_overview_tab(fingerprint):
+    dados = (*get_financial_data(fingerprint), get_aggregates(fingerprint))
+    figuras = (
+        *build_categoria_graphs(*dados),
+        build_receitas_despesas_graph(*dados),
+        build_saldo_acumulado_graph(*dados)
+    )
+    return (build_summary_cards(*dados), *map(figura_dict, figuras))
+
+@callback(
+    [Output('maiores-gastos-graph', 'figure'),
+     Output('maiores-receitas-graph', 'figure'),
+     Output('gastos-mes-graph', 'figure'),
+     Output('receitas-mes-graph', 'figure'),
+     Output('comparativo-anual-graph', 'figure'),
+     Output('relacao-ganhos-despesas-graph', 'figure')],
+    [Input('financial-store', 'data'),
+     Input('tabs', 'active_tab')]
+)
+def update_analysis_tab(fingerprint, active_tab):
+    if fingerprint is None or active_tab != 'tab-analysis':
+        raise PreventUpdate
+    return build_analysis_tab(fingerprint)
+
+@cache.memoize(timeout=CACHE_TIMEOUT)
+def build_analysis_tab(fingerprint):
+    dados = (*get_financial_data(fingerprint), get_aggregates(fingerprint))
+    figuras = (
+        *build_maiores_valores_graphs(*dados),
+        *build_valores_mes_graphs(*dados),
+        build_comparativo_anual_graph(*dados),
+        build_relacao_ganhos_despesas_graph(*dados)
+    )
+    return tuple(map(figura_dict, figuras))
+
+# Aquece o cache em segundo plano: as figuras das abas são montadas aqui
+# assim que os dados mudam, e os callbacks só leem o cache, não importa
+# quantos navegadores estejam com o dashboard aberto
+WARM_INTERVAL = 30
+
+def warm_cache():
+    while True:
+        try:
+            fingerprint = get_data_fingerprint()
+            build_overview_tab(fingerprint)
+            build_analysis_tab(fingerprint)
+        except Exception as e:
+            print(f"Erro ao atualizar o cache: {e}")
+        time.sleep(WARM_INTERVAL)
+
+def start_cache_warmer():
+    threading.Thread(target=warm_cache, name='cache-warmer', daemon=True).start()
+
+# Valor em reais no formato brasileiro: R$ 1.234,56
+SEPARADORES_BRL = str.maketrans(",.", ".,")
+
+def formatar_brl(valor):
+    return "R$ " + f"{valor:,.2f}".translate(SEPARADORES_BRL)
+
+# Tabela de resultados dos simuladores a partir de pares (descrição, valor);
+# a última linha, com o montante final, fica em negrito
+def tabela_resultados(linhas):
+    *corpo, (rotulo_final, valor_final) = linhas
+    return dbc.Table([
+        html.Thead(
+            html.Tr([
+                html.Th("Descrição"),
+                html.Th("Valor")
+            ], className="table-dark")
+        ),
+        html.Tbody(
+            [html.Tr([html.Td(rotulo), html.Td(valor)]) for rotulo, valor in corpo]
+            + [html.Tr([html.Td(rotulo_final), html.Td(valor_final, className="fw-bold")])]
+        )
+    ], bordered=True, hover=True, className="mb-4 table-dark")
+
+# Evolução mês a mês de um investimento com aportes fixos, em forma fechada:
+# V_k = V0 * (1 + r)^k + PMT * ((1 + r)^k - 1) / r, para k = 0..n
+def evolucao_mensal(valor_inicial, aporte, taxa_mensal, n):
+    meses = np.arange(n + 1)
+    crescimento = np.power(1 + taxa_mensal, meses)
+    if taxa_mensal:
+        valores = valor_inicial * crescimento + aporte * (crescimento - 1) / taxa_mensal
+    else:
+        valores = valor_inicial + aporte * meses.astype(float)
+    return meses, valores
+
+# Resultado do simulador de investimentos; memorizado pelos valores de
+# entrada, para cliques repetidos com os mesmos campos não refazerem o cálculo
+# nem o gráfico
+@lru_cache(maxsize=128)
+def simular_investimento(valor_inicial, aporte_mensal, taxa_juros, periodo):
+    # Converter taxa anual para mensal
+    taxa_mensal = (1 + taxa_juros/100) ** (1/12) - 1
+    
+    # Calcular montante: valor inicial capitalizado + valor futuro dos aportes
+    # Fórmula: FV = PMT * ((1 + r)^n - 1) / r
+    n = periodo * 12
+    fator = (1 + taxa_mensal) ** n
+    montante = valor_inicial * fator
+    if taxa_mensal:
+        montante += aporte_mensal * (fator - 1) / taxa_mensal
+    else:
+        montante += aporte_mensal * n
+    
+    # Calcular total investido
+    total_investido = valor_inicial + (aporte_mensal * periodo * 12)
+    
+    # Calcular juros ganhos
+    juros_ganhos = montante - total_investido
+    
+    # Criar tabela de resultados
+    table = tabela_resultados((
+        ("Valor inicial:", formatar_brl(valor_inicial)),
+        ("Aporte mensal:", formatar_brl(aporte_mensal)),
+        ("Taxa de juros anual:", f"{taxa_juros:.2f}%"),
+        ("Período:", f"{periodo} anos ({periodo * 12} meses)"),
+        ("Total investido:", formatar_brl(total_investido)),
+        ("Juros ganhos:", formatar_brl(juros_ganhos)),
+        ("Montante final:", formatar_brl(montante))
+    ))
+    
+    # Criar gráfico de evolução do investimento
+    meses, valores = evolucao_mensal(valor_inicial, aporte_mensal, taxa_mensal, n)
+    
+    # Curva em WebGL: com períodos longos são centenas de pontos
+    fig = go.Figure(
+        go.Scattergl(x=meses, y=valores, mode='lines+markers', line_color=colors['success']),
+        layout=dict(title='Evolução do Investimento')
+    )
+    fig.update_layout(
+        xaxis_title='Mês',
+        yaxis_title='Valor (R$)'
+    )
+    
+    return html.Div([
+        table,
+        dcc.Graph(figure=fig),
+        html.P(f"Com um investimento inicial de {formatar_brl(valor_inicial)} e aportes mensais de {formatar_brl(aporte_mensal)}, a uma taxa de {taxa_juros:.2f}% ao ano, você terá {formatar_brl(montante)} após {periodo} anos.", 
+            className="alert alert-success mt-3")
+    ])
+
 # Callback para o simulador de investimentos
 @callback(
     Output('resultado-investimento', 'children'),
@@ -1094,12 +1156,10 @@ def update_relacao_ganhos_despesas_graph(n_intervals):
     [State('valor-inicial-input', 'value'),
      State('aporte-mensal-input', 'value'),
      State('taxa-juros-input', 'value'),
-     State('periodo-input', 'value')]
+     State('periodo-input', 'value')],
+    prevent_initial_call=True
 )
 def calcular_investimento(n_clicks, valor_inicial, aporte_mensal, taxa_juros, periodo):
-    if n_clicks is None:
-        return html.Div("Preencha os campos e clique em Calcular para ver o resultado.")
-    
     try:
         # Validar inputs
         if valor_inicial is None or aporte_mensal is None or taxa_juros is None or periodo is None:
@@ -1111,122 +1171,97 @@ def calcular_investimento(n_clicks, valor_inicial, aporte_mensal, taxa_juros, pe
         taxa_juros = float(taxa_juros)
         periodo = int(periodo)
         
-        # Converter taxa anual para mensal
-        taxa_mensal = (1 + taxa_juros/100) ** (1/12) - 1
-        
-        # Calcular montante
-        montante = valor_inicial * (1 + taxa_mensal) ** (periodo * 12)
-        
-        # Calcular montante com aportes mensais
-        for i in range(1, periodo * 12 + 1):
-            montante += aporte_mensal * (1 + taxa_mensal) ** (periodo * 12 - i)
-        
-        # Calcular total investido
-        total_investido = valor_inicial + (aporte_mensal * periodo * 12)
-        
-        # Calcular juros ganhos
-        juros_ganhos = montante - total_investido
-        
-        # Criar tabela de resultados
-        table = dbc.Table([
-            html.Thead(
-                html.Tr([
-                    html.Th("Descrição"),
-                    html.Th("Valor")
-                ], className="table-dark")
-            ),
-            html.Tbody([
-                html.Tr([
-                    html.Td("Valor inicial:"),
-                    html.Td(f"R$ {valor_inicial:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Aporte mensal:"),
-                    html.Td(f"R$ {aporte_mensal:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Taxa de juros anual:"),
-                    html.Td(f"{taxa_juros:.2f}%")
-                ]),
-                html.Tr([
-                    html.Td("Período:"),
-                    html.Td(f"{periodo} anos ({periodo * 12} meses)")
-                ]),
-                html.Tr([
-                    html.Td("Total investido:"),
-                    html.Td(f"R$ {total_investido:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Juros ganhos:"),
-                    html.Td(f"R$ {juros_ganhos:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Montante final:"),
-                    html.Td(f"R$ {montante:.2f}", className="fw-bold")
-                ])
-            ])
-        ], bordered=True, hover=True, className="mb-4 table-dark")
-        
-        # Criar gráfico de evolução do investimento
-        meses = list(range(0, periodo * 12 + 1))
-        valores = []
-        
-        # Valor inicial
-        valor_atual = valor_inicial
-        valores.append(valor_atual)
-        
-        # Calcular evolução mês a mês
-        for i in range(1, periodo * 12 + 1):
-            valor_atual = valor_atual * (1 + taxa_mensal) + aporte_mensal
-            valores.append(valor_atual)
-        
-        df_evolucao = pd.DataFrame({
-            'mes': meses,
-            'valor': valores
-        })
-        
-        fig = px.line(
-            df_evolucao, 
-            x='mes', 
-            y='valor',
-            markers=True,
-            title='Evolução do Investimento',
-            template='plotly_dark'
-        )
-        fig.update_traces(line=dict(color=colors['success']))
-        fig.update_layout(
-            xaxis_title='Mês',
-            yaxis_title='Valor (R$)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=False, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=True, gridcolor=colors['grid'])
-        )
-        
-        return html.Div([
-            table,
-            dcc.Graph(figure=fig),
-            html.P(f"Com um investimento inicial de R$ {valor_inicial:.2f} e aportes mensais de R$ {aporte_mensal:.2f}, a uma taxa de {taxa_juros:.2f}% ao ano, você terá R$ {montante:.2f} após {periodo} anos.", 
-                className="alert alert-success mt-3")
-        ])
+        return simular_investimento(valor_inicial, aporte_mensal, taxa_juros, periodo)
     except Exception as e:
         return html.Div([
             html.P(f"Ocorreu um erro: {str(e)}", className="alert alert-danger")
         ])
 
+# Resultado do simulador de metas, memorizado da mesma forma
+@lru_cache(maxsize=128)
+def simular_meta(valor_meta, valor_mensal, juros):
+    # Converter taxa anual para mensal
+    taxa_mensal = (1 + juros/100) ** (1/12) - 1
+    
+    # Calcular número de meses necessários
+    # Fórmula: FV = PMT * ((1 + r)^n - 1) / r
+    # Resolvendo para n: n = log(1 + (FV * r / PMT)) / log(1 + r)
+    if taxa_mensal > 0:
+        n_meses = np.log(1 + (valor_meta * taxa_mensal / valor_mensal)) / np.log(1 + taxa_mensal)
+    else:
+        n_meses = valor_meta / valor_mensal
+    
+    # Arredondar para cima
+    n_meses = np.ceil(n_meses)
+    
+    # Calcular anos e meses
+    anos = int(n_meses // 12)
+    meses_restantes = int(n_meses % 12)
+    
+    # Calcular montante final (pode ser ligeiramente diferente da meta devido ao arredondamento)
+    # Fórmula: FV = PMT * ((1 + r)^n - 1) / r
+    if taxa_mensal:
+        montante = valor_mensal * ((1 + taxa_mensal) ** int(n_meses) - 1) / taxa_mensal
+    else:
+        montante = valor_mensal * int(n_meses)
+    
+    # Calcular total investido
+    total_investido = valor_mensal * n_meses
+    
+    # Calcular juros ganhos
+    juros_ganhos = montante - total_investido
+    
+    # Criar tabela de resultados
+    table = tabela_resultados((
+        ("Valor da meta:", formatar_brl(valor_meta)),
+        ("Valor mensal disponível:", formatar_brl(valor_mensal)),
+        ("Taxa de juros anual:", f"{juros:.2f}%"),
+        ("Tempo necessário:", f"{anos} anos e {meses_restantes} meses ({int(n_meses)} meses no total)"),
+        ("Total investido:", formatar_brl(total_investido)),
+        ("Juros ganhos:", formatar_brl(juros_ganhos)),
+        ("Montante final:", formatar_brl(montante))
+    ))
+    
+    # Criar gráfico de evolução da meta
+    meses, valores = evolucao_mensal(0.0, valor_mensal, taxa_mensal, int(n_meses))
+    
+    fig = go.Figure(
+        go.Scattergl(x=meses, y=valores, mode='lines+markers', line_color=colors['primary']),
+        layout=dict(title='Evolução para Atingir a Meta')
+    )
+    
+    # Adicionar linha horizontal para a meta
+    fig.add_shape(
+        type="line",
+        x0=0,
+        y0=valor_meta,
+        x1=n_meses,
+        y1=valor_meta,
+        line=dict(color=colors['danger'], width=2, dash="dash"),
+    )
+    
+    fig.update_layout(
+        xaxis_title='Mês',
+        yaxis_title='Valor (R$)'
+    )
+    
+    return html.Div([
+        table,
+        dcc.Graph(figure=fig),
+        html.P(f"Para atingir sua meta de {formatar_brl(valor_meta)}, economizando {formatar_brl(valor_mensal)} por mês com uma taxa de juros de {juros:.2f}% ao ano, você precisará de {anos} anos e {meses_restantes} meses.", 
+            className="alert alert-info mt-3")
+    ])
+
 # Callback para o simulador de metas financeiras
 @callback(
     Output('resultado-meta', 'children'),
     [Input('calcular-meta-button', 'n_clicks')],
     [State('valor-meta-input', 'value'),
      State('valor-mensal-input', 'value'),
-     State('taxa-juros-meta-input', 'value')]
+     State('taxa-juros-meta-input', 'value')],
+    prevent_initial_call=True
 )
 def calcular_meta(n_clicks, valor_meta, valor_mensal, juros):
-    if n_clicks is None:
-        return html.Div("Preencha os campos e clique em Calcular para ver o resultado.")
-    
     try:
         # Validar inputs
         if valor_meta is None or valor_mensal is None or juros is None:
@@ -1237,126 +1272,7 @@ def calcular_meta(n_clicks, valor_meta, valor_mensal, juros):
         valor_mensal = float(valor_mensal)
         juros = float(juros)
         
-        # Converter taxa anual para mensal
-        taxa_mensal = (1 + juros/100) ** (1/12) - 1
-        
-        # Calcular número de meses necessários
-        # Fórmula: FV = PMT * ((1 + r)^n - 1) / r
-        # Resolvendo para n: n = log(1 + (FV * r / PMT)) / log(1 + r)
-        if taxa_mensal > 0:
-            n_meses = np.log(1 + (valor_meta * taxa_mensal / valor_mensal)) / np.log(1 + taxa_mensal)
-        else:
-            n_meses = valor_meta / valor_mensal
-        
-        # Arredondar para cima
-        n_meses = np.ceil(n_meses)
-        
-        # Calcular anos e meses
-        anos = int(n_meses // 12)
-        meses_restantes = int(n_meses % 12)
-        
-        # Calcular montante final (pode ser ligeiramente diferente da meta devido ao arredondamento)
-        montante = 0
-        for i in range(1, int(n_meses) + 1):
-            montante += valor_mensal * (1 + taxa_mensal) ** (int(n_meses) - i)
-        
-        # Calcular total investido
-        total_investido = valor_mensal * n_meses
-        
-        # Calcular juros ganhos
-        juros_ganhos = montante - total_investido
-        
-        # Criar tabela de resultados
-        table = dbc.Table([
-            html.Thead(
-                html.Tr([
-                    html.Th("Descrição"),
-                    html.Th("Valor")
-                ], className="table-dark")
-            ),
-            html.Tbody([
-                html.Tr([
-                    html.Td("Valor da meta:"),
-                    html.Td(f"R$ {valor_meta:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Valor mensal disponível:"),
-                    html.Td(f"R$ {valor_mensal:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Taxa de juros anual:"),
-                    html.Td(f"{juros:.2f}%")
-                ]),
-                html.Tr([
-                    html.Td("Tempo necessário:"),
-                    html.Td(f"{anos} anos e {meses_restantes} meses ({int(n_meses)} meses no total)")
-                ]),
-                html.Tr([
-                    html.Td("Total investido:"),
-                    html.Td(f"R$ {total_investido:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Juros ganhos:"),
-                    html.Td(f"R$ {juros_ganhos:.2f}")
-                ]),
-                html.Tr([
-                    html.Td("Montante final:"),
-                    html.Td(f"R$ {montante:.2f}", className="fw-bold")
-                ])
-            ])
-        ], bordered=True, hover=True, className="mb-4 table-dark")
-        
-        # Criar gráfico de evolução da meta
-        meses = list(range(0, int(n_meses) + 1))
-        valores = [0]  # Começar com zero
-        
-        # Calcular evolução mês a mês
-        valor_atual = 0
-        for i in range(1, int(n_meses) + 1):
-            valor_atual = valor_atual * (1 + taxa_mensal) + valor_mensal
-            valores.append(valor_atual)
-        
-        df_evolucao = pd.DataFrame({
-            'mes': meses,
-            'valor': valores
-        })
-        
-        fig = px.line(
-            df_evolucao, 
-            x='mes', 
-            y='valor',
-            markers=True,
-            title='Evolução para Atingir a Meta',
-            template='plotly_dark'
-        )
-        
-        # Adicionar linha horizontal para a meta
-        fig.add_shape(
-            type="line",
-            x0=0,
-            y0=valor_meta,
-            x1=n_meses,
-            y1=valor_meta,
-            line=dict(color=colors['danger'], width=2, dash="dash"),
-        )
-        
-        fig.update_traces(line=dict(color=colors['primary']))
-        fig.update_layout(
-            xaxis_title='Mês',
-            yaxis_title='Valor (R$)',
-            paper_bgcolor=colors['card_background'],
-            plot_bgcolor=colors['card_background'],
-            font={'color': colors['text']},
-            xaxis=dict(showgrid=False, gridcolor=colors['grid']),
-            yaxis=dict(showgrid=True, gridcolor=colors['grid'])
-        )
-        
-        return html.Div([
-            table,
-            dcc.Graph(figure=fig),
-            html.P(f"Para atingir sua meta de R$ {valor_meta:.2f}, economizando R$ {valor_mensal:.2f} por mês com uma taxa de juros de {juros:.2f}% ao ano, você precisará de {anos} anos e {meses_restantes} meses.", 
-                className="alert alert-info mt-3")
-        ])
+        return simular_meta(valor_meta, valor_mensal, juros)
     except Exception as e:
         return html.Div([
             html.P(f"Ocorreu um erro: {str(e)}", className="alert alert-danger")
@@ -1371,4 +1287,5 @@ if __name__ == '__main__':
     port = int(os.getenv("DASHBOARD_PORT", 12000))
     
     print(f"Iniciando dashboard na porta {port}...")
-    app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
+    start_cache_warmer()
+    serve(server, host='0.0.0.0', port=port, threads=DASHBOARD_THREADS)
@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from bot_dashboard_unified import ProcessadorPorChat
+
+
+def update_do_chat(chat_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id))
+
+
+class ProcessadorPorChatTest(unittest.IsolatedAsyncioTestCase):
+    async def test_chat_inundando_nao_trava_outro_chat(self):
+        processador = ProcessadorPorChat(2)
+        liberar = asyncio.Event()
+
+        async def lento():
+            await liberar.wait()
+
+        async def rapido():
+            pass
+
+        # O chat 1 enfileira bem mais updates do que há vagas globais
+        inundacao = [
+            asyncio.create_task(processador.process_update(update_do_chat(1), lento()))
+            for _ in range(10)
+        ]
+        await asyncio.sleep(0)
+
+        # O update do chat 2 é processado mesmo com o chat 1 ainda parado
+        await asyncio.wait_for(processador.process_update(update_do_chat(2), rapido()), timeout=1)
+        self.assertFalse(any(tarefa.done() for tarefa in inundacao))
+
+        liberar.set()
+        await asyncio.wait_for(asyncio.gather(*inundacao), timeout=1)
+
+    async def test_mantem_ordem_dentro_do_chat(self):
+        processador = ProcessadorPorChat(4)
+        ordem = []
+
+        async def registra(indice):
+            await asyncio.sleep(0.01 * (5 - indice))
+            ordem.append(indice)
+
+        await asyncio.gather(*(
+            processador.process_update(update_do_chat(1), registra(indice))
+            for indice in range(5)
+        ))
+        self.assertEqual(ordem, list(range(5)))
+
+
+if __name__ == "__main__":
+    unittest.main()